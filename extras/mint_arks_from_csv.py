@@ -18,6 +18,9 @@ written to the output CSV. This allows you to include columns such as
 "node_id" so the output CSV can be used to update items in the target
 website.
 
+ARKs are minted in batches of --batch_size rows, each in a single request
+to larkm's /larkm/batch endpoint.
+
 Usage: 1) Make sure the IP address of the machine running this script is
 present in larkm's "trusted_ips" configuration option. 2) Change the six
 variables below to your own values. 3) Run python mint_arks_from_csv.py
@@ -62,6 +65,12 @@ parser.add_argument(
     "--larkm_api_key_file_path",
     help="Path to a file containing An API key registered with larkm. File should only have a single line, containing the key.",
 )
+parser.add_argument(
+    "--batch_size",
+    help="The number of ARKs to mint in each request to larkm. Defaults to 1000.",
+    type=int,
+    default=1000,
+)
 parser.add_argument(
     "--confirm_arks",
     help='Whether or not to to confirm that the ARK was created successfully by requesting a redirection to the "target" value in the input CSV.',
@@ -112,6 +121,67 @@ writer_file_handle = open(args.output_csv, "w+", newline="", encoding="utf-8")
 writer = csv.DictWriter(writer_file_handle, fieldnames=input_csv_reader_fieldnames)
 writer.writeheader()
 
+
+def mint_batch(batch):
+    """Mints the ARKs for a list of (row, data) tuples in a single request to larkm's
+    /larkm/batch endpoint and writes the rows to the output CSV."""
+    larkm_host = args.larkm_host.rstrip("/")
+    endpoint = f"{larkm_host}/larkm/batch"
+    if len(api_key) == 0:
+        headers = {"Content-Type": "application/json"}
+    else:
+        headers = {"Content-Type": "application/json", "Authorization": api_key}
+
+    try:
+        r = requests.post(
+            endpoint,
+            json={"naan": args.naan, "arks": [data for row, data in batch]},
+            headers=headers,
+        )
+    except Exception as e:
+        print(f"Sorry, there was a problem connecting to {endpoint}: {e}")
+        return
+
+    if r.status_code == 200:
+        results = json.loads(r.text)["results"]
+    else:
+        print(
+            f"Could not mint batch of ARKs. Response code is {r.status_code}, response body is {r.text}."
+        )
+        results = [{"status_code": r.status_code, "detail": r.text}] * len(batch)
+
+    for (row, data), result in zip(batch, results):
+        if result["status_code"] == 201:
+            row["ark_local_resolver"] = f'{larkm_host}/{result["ark"]["ark_string"]}'
+            row["ark_n2t_resolver"] = f'https://n2t.net/{result["ark"]["ark_string"]}'
+
+            try:
+                if args.confirm_arks is True:
+                    cr = requests.get(row["ark_local_resolver"], allow_redirects=False)
+                    if cr.headers.get("location") == row["target"]:
+                        row["test_resolution"] = "confirmed"
+                    else:
+                        row["test_resolution"] = "ARK not resolving"
+            except Exception as e:
+                print(
+                    f'Sorry, there was a problem confirming the ARK, error connecting to {row["ark_local_resolver"]}: {e}'
+                )
+
+            print(f'ARK for "{row["title"]}" ({row["target"]}) registered with larkm.')
+        else:
+            print(
+                f'Could not mint ARK for "{row["title"]}". Response code is {result["status_code"]}: {result["detail"]}'
+            )
+            row["ark_local_resolver"] = "error"
+            row["ark_n2t_resolver"] = "error"
+
+        try:
+            writer.writerow(row)
+        except Exception as e:
+            print(e)
+
+
+batch = []
 for row in input_csv_reader:
     data = {"target": row["target"], "naan": args.naan, "what": row["title"]}
     if "uuid" in row and len(row["uuid"]) > 0:
@@ -130,46 +200,12 @@ for row in input_csv_reader:
         data["shoulder"] = args.shoulder
 
     if persister == "rest":
-        larkm_host = args.larkm_host.rstrip("/")
-        endpoint = f"{larkm_host}/larkm"
-        if len(api_key) == 0:
-            headers = {"Content-Type": "application/json"}
-        else:
-            headers = {"Content-Type": "application/json", "Authorization": api_key}
-
-        try:
-            r = requests.post(endpoint, json=data, headers=headers)
-            if r.status_code == 201:
-                body = json.loads(r.text)
-                row["ark_local_resolver"] = f'{larkm_host}/{body["ark"]["ark_string"]}'
-                row["ark_n2t_resolver"] = f'https://n2t.net/{body["ark"]["ark_string"]}'
+        batch.append((row, data))
+        if len(batch) >= args.batch_size:
+            mint_batch(batch)
+            batch = []
+        continue
 
-                try:
-                    if args.confirm_arks is True:
-                        cr = requests.get(
-                            row["ark_local_resolver"], allow_redirects=False
-                        )
-                        if cr.headers.get("location") == row["target"]:
-                            row["test_resolution"] = "confirmed"
-                        else:
-                            row["test_resolution"] = "ARK not resolving"
-                except Exception as e:
-                    print(
-                        f'Sorry, there was a problem confirming the ARK, error connecting to {row["ark_local_resolver"]}: {e}'
-                    )
-
-                print(
-                    f'ARK for "{row["title"]}" ({row["target"]}) registered with larkm.'
-                )
-            else:
-                print(
-                    f"Could not mint ARK. Response code is {r.status_code}, response body is {r.text}."
-                )
-                row["ark_local_resolver"] = "error"
-                row["ark_n2t_resolver"] = "error"
-        except Exception as e:
-            print(f"Sorry, there was a problem connecting to {endpoint}: {e}")
-            continue
     if persister == "local_db":
         # policy column is required if we're persisting ARKs directly to the database, since
         # larkm adds the default policy statement if there is none provided.
@@ -258,6 +294,9 @@ for row in input_csv_reader:
     except Exception as e:
         print(e)
 
+if persister == "rest" and len(batch) > 0:
+    mint_batch(batch)
+
 if persister == "local_db":
     con.close()
 
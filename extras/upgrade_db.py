@@ -0,0 +1,74 @@
+"""Upgrade a larkm database to the latest schema version.
+
+Usage: python upgrade_db.py path/to/larkm.json 99999
+
+where 99999 is the NAAN whose "sqlite_db_path" should be upgraded. Add --status
+to see the database's current schema version and the migrations that have not
+been applied to it, without changing anything.
+
+Stop larkm (or at least make sure nothing is writing to the database) before
+upgrading, and restart it afterward so it detects the new schema version. See
+the "Upgrading the database" section of the larkm README for more information.
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+
+parser = argparse.ArgumentParser()
+parser.add_argument("config", help="Path to the larkm configuration file.")
+parser.add_argument("naan", help="The NAAN whose database should be upgraded.")
+parser.add_argument(
+    "--status",
+    help="Report the database's schema version without upgrading it.",
+    action="store_true",
+)
+args = parser.parse_args()
+
+# larkm reads its configuration file when it is imported.
+os.environ["LARKM_CONFIG_FILE_PATH"] = args.config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import larkm
+
+if args.naan not in larkm.config.keys():
+    sys.exit(
+        f"Configuration for specified NAAN {args.naan} is not present in config file {args.config}."
+    )
+
+db_path = larkm.config[args.naan]["sqlite_db_path"]
+if not os.path.exists(db_path):
+    sys.exit(f'Error: larkm database file "{db_path}" not found.')
+
+con = sqlite3.connect(db_path)
+current_version = larkm.get_schema_version(con)
+con.close()
+
+print(f"{db_path} is at schema version {current_version}.")
+for version, (description, statements) in enumerate(larkm.schema_migrations, 1):
+    if version > current_version:
+        print(f"Pending migration {version}: {description}")
+
+if args.status:
+    sys.exit()
+
+try:
+    applied = larkm.upgrade_database(db_path)
+except sqlite3.IntegrityError as e:
+    # Show the rows that prevent a unique index from being created.
+    con = sqlite3.connect(db_path)
+    for column in ["identifier", "ark_string", "target"]:
+        duplicates = con.execute(
+            f"select {column}, count(*) from arks where {column} != '' group by {column} having count(*) > 1"
+        ).fetchall()
+        for value, count in duplicates:
+            print(f"{count} ARKs have the {column} {value}.")
+    con.close()
+    sys.exit(
+        f"Error: could not upgrade {db_path} ({e}). Resolve the conflicts listed above and try again."
+    )
+
+if len(applied) == 0:
+    print("Database is already up to date.")
+else:
+    print(f"Upgraded {db_path} to schema version {applied[-1]}.")
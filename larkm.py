@@ -1,17 +1,22 @@
 import os
 import time
+import atexit
 import copy
 import re
 import sqlite3
 import json
 from uuid import uuid4
-import logging
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime
 from typing import Optional
 
 from typing_extensions import Annotated
 from fastapi import FastAPI, Response, Request, Header, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from whoosh import index
 from whoosh.qparser import QueryParser
@@ -20,7 +25,511 @@ config_file_path = os.getenv("LARKM_CONFIG_FILE_PATH") or "larkm.json"
 with open(config_file_path, "r") as config_file:
     config = json.load(config_file)
 
-app = FastAPI()
+
+class ConnectionPool:
+    """
+    Long-lived SQLite connections for a single database file. Read connections are
+    checked out by the thread handling a request and returned when it is done with
+    them; all writes go through a single connection that is serialized by a lock.
+
+    - **db_path**: path to the SQLite database file.
+    - **size**: maximum number of read connections to open.
+    - **busy_timeout**: milliseconds to wait on a locked database before giving up.
+    - **wal_mode**: whether to put the database into write-ahead logging mode.
+    """
+
+    def __init__(self, db_path, size=5, busy_timeout=5000, wal_mode=False):
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self.wal_mode = wal_mode
+        self._idle_readers = queue.LifoQueue()
+        self._num_readers = 0
+        self._readers_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._schema_version = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "reader_checkouts": 0,
+            "reader_waits": 0,
+            "write_transactions": 0,
+            "write_lock_waits": 0,
+        }
+
+    def _connect(self):
+        con = sqlite3.connect(
+            self.db_path, timeout=self.busy_timeout / 1000, check_same_thread=False
+        )
+        con.row_factory = sqlite3.Row
+        con.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        if self.wal_mode:
+            con.execute("PRAGMA journal_mode = WAL")
+        return con
+
+    def _count(self, stat):
+        with self._stats_lock:
+            self._stats[stat] += 1
+
+    @contextmanager
+    def reader(self):
+        """Checks out a read connection, opening a new one if the pool isn't full."""
+        try:
+            con = self._idle_readers.get_nowait()
+        except queue.Empty:
+            with self._readers_lock:
+                create = self._num_readers < self.size
+                if create:
+                    self._num_readers += 1
+            if create:
+                try:
+                    con = self._connect()
+                except sqlite3.DatabaseError:
+                    with self._readers_lock:
+                        self._num_readers -= 1
+                    raise
+            else:
+                self._count("reader_waits")
+                con = self._idle_readers.get()
+        self._count("reader_checkouts")
+        try:
+            yield con
+        finally:
+            self._idle_readers.put(con)
+
+    @contextmanager
+    def writer(self):
+        """Yields the write connection inside a transaction that is committed on
+        success and rolled back if an exception is raised."""
+        if not self._writer_lock.acquire(blocking=False):
+            self._count("write_lock_waits")
+            self._writer_lock.acquire()
+        try:
+            if self._writer is None:
+                self._writer = self._connect()
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+            self._count("write_transactions")
+        finally:
+            self._writer_lock.release()
+
+    @property
+    def schema_version(self):
+        """The database's schema version, read the first time it is needed."""
+        if self._schema_version is None:
+            with self.reader() as con:
+                self._schema_version = get_schema_version(con)
+        return self._schema_version
+
+    def stats(self):
+        with self._stats_lock:
+            counters = dict(self._stats)
+        return {
+            "db_path": self.db_path,
+            "size": self.size,
+            "busy_timeout": self.busy_timeout,
+            "wal_mode": self.wal_mode,
+            "schema_version": self._schema_version,
+            "reader_connections": self._num_readers,
+            "idle_readers": self._idle_readers.qsize(),
+            "writer_connected": self._writer is not None,
+            **counters,
+        }
+
+    def close(self):
+        while True:
+            try:
+                self._idle_readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._readers_lock:
+            self._num_readers = 0
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+# Connection pools, keyed by sqlite_db_path so NAANs sharing a database share a pool.
+pools = dict()
+pools_lock = threading.Lock()
+
+
+def get_pool(naan):
+    """
+    Returns the connection pool for the NAAN's database, creating it on first use.
+
+    - **naan**: the NAAN.
+    """
+    db_path = config[naan]["sqlite_db_path"]
+    pool = pools.get(db_path)
+    if pool is None:
+        with pools_lock:
+            pool = pools.get(db_path)
+            if pool is None:
+                pool_config = config[naan].get("sqlite_pool", dict())
+                pool = ConnectionPool(
+                    db_path,
+                    size=int(pool_config.get("size", 5)),
+                    busy_timeout=int(pool_config.get("busy_timeout", 5000)),
+                    wal_mode=pool_config.get("wal_mode", "no") == "yes",
+                )
+                pools[db_path] = pool
+    return pool
+
+
+def close_pools():
+    with pools_lock:
+        for pool in pools.values():
+            pool.close()
+        pools.clear()
+
+
+# Schema migrations applied by upgrade_database(), in order. A migration's position
+# in this list, starting at 1, is the schema version it upgrades the database to.
+schema_migrations = [
+    (
+        "Remove duplicate rows and add unique indexes on identifier, ark_string, and non-empty target.",
+        [
+            "delete from arks where rowid not in (select min(rowid) from arks group by date_created, date_modified, shoulder, identifier, ark_string, target, erc_who, erc_what, erc_when, erc_where, policy)",
+            "create unique index identifier_unique_idx on arks(identifier)",
+            "create unique index ark_string_unique_idx on arks(ark_string)",
+            "create unique index target_unique_idx on arks(target) where target != ''",
+            "drop index if exists ark_string_idx",
+            "drop index if exists target_lookup_idx",
+        ],
+    ),
+]
+
+
+def get_schema_version(con):
+    """
+    Returns the version of the most recent migration applied to the database, or 0
+    if it has never been upgraded.
+
+    - **con**: a connection to the database.
+    """
+    table = con.execute(
+        "select name from sqlite_master where type = 'table' and name = 'schema_version'"
+    ).fetchone()
+    if table is None:
+        return 0
+    return con.execute("select max(version) from schema_version").fetchone()[0] or 0
+
+
+def upgrade_database(db_path):
+    """
+    Applies any migrations in schema_migrations that the database doesn't have yet,
+    each in its own transaction. Returns the list of versions applied. Raises
+    sqlite3.IntegrityError if a unique index can't be created because the arks table
+    contains conflicting rows.
+
+    - **db_path**: path to the SQLite database file.
+    """
+    con = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+    try:
+        con.execute(
+            "create table if not exists schema_version(version INTEGER NOT NULL, description TEXT NOT NULL, date_applied TEXT NOT NULL)"
+        )
+        current_version = get_schema_version(con)
+        for version, (description, statements) in enumerate(schema_migrations, 1):
+            if version <= current_version:
+                continue
+            con.execute("begin")
+            try:
+                for statement in statements:
+                    con.execute(statement)
+                con.execute(
+                    "insert into schema_version values (?, ?, datetime())",
+                    (version, description),
+                )
+                con.execute("commit")
+            except sqlite3.DatabaseError:
+                con.execute("rollback")
+                raise
+            applied.append(version)
+    finally:
+        con.close()
+    return applied
+
+
+class ResolutionCache:
+    """
+    A bounded, least-recently-used cache of ARK records keyed by ARK string. Entries
+    expire ttl seconds after they are added. Writers call invalidate() so a record
+    read from the database before a write is never cached after it.
+
+    - **max_size**: the maximum number of ARKs to keep in the cache.
+    - **ttl**: the number of seconds an entry is considered fresh.
+    """
+
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def get(self, ark_string):
+        with self._lock:
+            entry = self._entries.get(ark_string)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[ark_string]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(ark_string)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def set(self, ark_string, record, version):
+        """
+        Adds a record to the cache, unless the cache has been invalidated since
+        version was read.
+        """
+        if self.max_size < 1:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[ark_string] = (time.monotonic() + self.ttl, record)
+            self._entries.move_to_end(ark_string)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, ark_string):
+        with self._lock:
+            self.version += 1
+            self._entries.pop(ark_string, None)
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                **self._stats,
+            }
+
+
+# Resolution caches, keyed by sqlite_db_path like the connection pools.
+caches = dict()
+caches_lock = threading.Lock()
+
+
+def get_cache(naan):
+    """
+    Returns the resolution cache for the NAAN's database, creating it on first use.
+
+    - **naan**: the NAAN.
+    """
+    db_path = config[naan]["sqlite_db_path"]
+    cache = caches.get(db_path)
+    if cache is None:
+        with caches_lock:
+            cache = caches.get(db_path)
+            if cache is None:
+                cache_config = config[naan].get("resolution_cache", dict())
+                cache = ResolutionCache(
+                    max_size=int(cache_config.get("max_size", 10000)),
+                    ttl=float(cache_config.get("ttl", 300)),
+                )
+                caches[db_path] = cache
+    return cache
+
+
+def get_ark_record(naan, ark_string):
+    """
+    Returns the ARK's row from the arks table as a dict, or None if the ARK doesn't
+    exist. Records are served from the NAAN's resolution cache when possible. Can
+    raise sqlite3.DatabaseError.
+
+    - **naan**: the NAAN.
+    - **ark_string**: the ARK as a string, i.e., ark:{naan}/{identifier}
+    """
+    cache = get_cache(naan)
+    record = cache.get(ark_string)
+    if record is not None:
+        return record
+
+    version = cache.version
+    with get_pool(naan).reader() as con:
+        row = con.execute(
+            "select * from arks where ark_string = :a_s", {"a_s": ark_string}
+        ).fetchone()
+    if row is None:
+        return None
+    record = dict(zip(row.keys(), row))
+    cache.set(ark_string, record, version)
+    return record
+
+
+class RequestLogWriter:
+    """
+    Writes log entries from a background thread so that requests don't wait on the
+    filesystem. Entries are queued along with the path of the log file they belong
+    to, and are written in batches once batch_size entries are waiting or
+    flush_interval seconds have passed. Each log file is kept open between batches.
+
+    - **max_queue_size**: the maximum number of entries waiting to be written.
+    - **overflow**: what to do with a new entry when the queue is full, either
+      "drop" it or "block" the request until there is room for it.
+    - **batch_size**: the maximum number of entries to write in one batch.
+    - **flush_interval**: the maximum number of seconds an entry waits to be written.
+    """
+
+    def __init__(
+        self, max_queue_size=10000, overflow="drop", batch_size=100, flush_interval=1.0
+    ):
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._files = dict()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats = {"written": 0, "dropped": 0, "batches": 0, "errors": 0}
+
+    def write(self, log_file_path, entry):
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="larkm-log-writer", daemon=True
+                    )
+                    self._thread.start()
+        if self.overflow == "block":
+            self._queue.put((log_file_path, entry))
+        else:
+            try:
+                self._queue.put_nowait((log_file_path, entry))
+            except queue.Full:
+                with self._thread_lock:
+                    self._stats["dropped"] += 1
+
+    def flush(self):
+        """Blocks until every queued entry has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            finally:
+                for i in range(len(batch)):
+                    self._queue.task_done()
+
+    def _write_batch(self, batch):
+        entries_by_path = dict()
+        for log_file_path, entry in batch:
+            entries_by_path.setdefault(log_file_path, []).append(entry)
+        for log_file_path, entries in entries_by_path.items():
+            try:
+                if log_file_path not in self._files:
+                    self._files[log_file_path] = open(log_file_path, "a")
+                log_file = self._files[log_file_path]
+                log_file.write("\n".join(entries) + "\n")
+                log_file.flush()
+                self._stats["written"] += len(entries)
+            except OSError:
+                self._stats["errors"] += len(entries)
+        self._stats["batches"] += 1
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue_size": self._queue.maxsize,
+            "overflow": self.overflow,
+            **self._stats,
+        }
+
+    def close(self):
+        self.flush()
+        for log_file in self._files.values():
+            log_file.close()
+        self._files.clear()
+
+
+log_writer = RequestLogWriter(
+    max_queue_size=int(os.getenv("LARKM_LOG_QUEUE_SIZE") or 10000),
+    overflow=os.getenv("LARKM_LOG_OVERFLOW") or "drop",
+    batch_size=int(os.getenv("LARKM_LOG_BATCH_SIZE") or 100),
+    flush_interval=float(os.getenv("LARKM_LOG_FLUSH_INTERVAL") or 1.0),
+)
+atexit.register(log_writer.flush)
+
+
+def get_ark_records(naan, ark_strings, chunk_size=500):
+    """
+    Returns a dict mapping each of the ARK strings that exist to its row from the
+    arks table. Records are served from the NAAN's resolution cache when possible,
+    and the rest are queried in chunks. Can raise sqlite3.DatabaseError.
+
+    - **naan**: the NAAN.
+    - **ark_strings**: the ARKs to look up, as strings, i.e., ark:{naan}/{identifier}
+    - **chunk_size**: the number of ARKs to query at a time.
+    """
+    cache = get_cache(naan)
+    records = dict()
+    ark_strings_to_query = []
+    for ark_string in set(ark_strings):
+        record = cache.get(ark_string)
+        if record is None:
+            ark_strings_to_query.append(ark_string)
+        else:
+            records[ark_string] = record
+
+    version = cache.version
+    with get_pool(naan).reader() as con:
+        for start in range(0, len(ark_strings_to_query), chunk_size):
+            chunk = ark_strings_to_query[start : start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = con.execute(
+                f"select * from arks where ark_string in ({placeholders})", chunk
+            )
+            for row in rows:
+                record = dict(zip(row.keys(), row))
+                records[record["ark_string"]] = record
+                cache.set(record["ark_string"], record, version)
+    return records
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    log_writer.close()
+    close_pools()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 class Ark(BaseModel):
@@ -36,6 +545,11 @@ class Ark(BaseModel):
     policy: Optional[str] = None
 
 
+class ArkBatch(BaseModel):
+    naan: str
+    arks: list[Ark]
+
+
 @app.get("/ark:{naan}/{identifier}")
 @app.get("/ark:/{naan}/{identifier}")
 def resolve_ark(
@@ -73,15 +587,8 @@ def resolve_ark(
         config[naan]["allowed_shoulders"].insert(0, config[naan]["default_shoulder"])
 
     try:
-        con = sqlite3.connect(config[naan]["sqlite_db_path"])
-        con.row_factory = sqlite3.Row
-        cur = con.cursor()
-        cur.execute(
-            "select target from arks where ark_string = :a_s", {"a_s": ark_string}
-        )
-        record = cur.fetchone()
+        record = get_ark_record(naan, ark_string)
         if record is None:
-            con.close()
             if config[naan]["log_file_path"]:
                 log_request(
                     "INFO",
@@ -92,7 +599,6 @@ def resolve_ark(
                     "ARK not found",
                 )
             raise HTTPException(status_code=404, detail="ARK not found")
-        con.close()
     except sqlite3.DatabaseError as e:
         log_request(
             "ERROR", request.client.host, ark_string, request.headers, None, str(e)
@@ -100,18 +606,8 @@ def resolve_ark(
         raise HTTPException(status_code=500)
 
     # No target.
-    if len(record[0]) == 0:
-        info_content = get_info_content(ark_string)
-
-        if info_content is None:
-            raise HTTPException(status_code=404, detail="ARK not found")
-
-        # get_info_content() can also return an exception.
-        if isinstance(info_content, Exception):
-            log_request(
-                "ERROR", request.client.host, ark_string, request.headers, None, str(e)
-            )
-            raise HTTPException(status_code=500)
+    if len(record["target"]) == 0:
+        info_content = get_info_content(ark_string, record)
 
         if config[naan]["log_file_path"]:
             log_request(
@@ -136,17 +632,7 @@ def resolve_ark(
             )
         return RedirectResponse(record["target"])
     else:
-        info_content = get_info_content(ark_string)
-
-        if info_content is None:
-            raise HTTPException(status_code=404, detail="ARK not found")
-
-        # get_info_content() can also return an exception.
-        if isinstance(info_content, Exception):
-            log_request(
-                "ERROR", request.client.host, ark_string, request.headers, None, str(e)
-            )
-            raise HTTPException(status_code=500)
+        info_content = get_info_content(ark_string, record)
 
         if config[naan]["log_file_path"]:
             log_request(
@@ -177,13 +663,8 @@ def get_ark(
     ark_string = f"ark:{naan}/{identifier}"
 
     try:
-        con = sqlite3.connect(config[naan]["sqlite_db_path"])
-        con.row_factory = sqlite3.Row
-        cur = con.cursor()
-        cur.execute("select * from arks where ark_string = :a_s", {"a_s": ark_string})
-        record = cur.fetchone()
+        record = get_ark_record(naan, ark_string)
         if record is None:
-            con.close()
             if config[naan]["log_file_path"]:
                 log_request(
                     "INFO",
@@ -194,8 +675,6 @@ def get_ark(
                     "ARK not found",
                 )
             raise HTTPException(status_code=404, detail="ARK not found")
-        con.close()
-        ark = record
     except sqlite3.DatabaseError as e:
         log_request(
             "ERROR",
@@ -217,7 +696,6 @@ def get_ark(
             "ARK data retrieved.",
         )
 
-    # Row objects aren't subscriptable so we need to convert it into a dict.
     record_to_return = dict()
     columns = [
         "date_created",
@@ -232,11 +710,11 @@ def get_ark(
         "erc_where",
         "policy",
     ]
-    for col, val in zip(columns, record):
+    for col in columns:
         if col == "erc_where":
             record_to_return["erc_where"] = get_erc_where_value(naan, ark_string)
         else:
-            record_to_return[col] = val
+            record_to_return[col] = record[col]
 
     return record_to_return
 
@@ -298,71 +776,48 @@ def create_ark(
     """
     check_access(request, ark.naan, authorization)
 
-    if (
-        config[ark.naan]["default_shoulder"]
-        not in config[ark.naan]["allowed_shoulders"]
-    ):
-        config[ark.naan]["allowed_shoulders"].insert(
-            0, config[ark.naan]["default_shoulder"]
-        )
-
-    # Validate shoulder if provided.
-    if ark.shoulder is not None:
-        if ark.shoulder not in config[ark.naan]["allowed_shoulders"]:
-            raise HTTPException(status_code=422, detail="Provided shoulder is invalid.")
-
-    # Validate NAAN.
-    if ark.naan is not None:
-        if ark.naan != config[ark.naan]["naan"]:
-            raise HTTPException(status_code=422, detail="Provided NAAN is invalid.")
+    assemble_ark(ark)
 
-    if (
-        ark.policy is not None
-        and config[ark.naan]["constrain_commitment_statements"] == "yes"
-    ):
-        raise HTTPException(
-            status_code=422, detail="Providing a policy is not allowed."
+    # See if provided identifier is already being used. Databases upgraded to schema
+    # version 1 or later have unique indexes on identifier, ark_string and target, so
+    # for those we let the insert detect collisions instead of checking first.
+    try:
+        unique_indexes = get_pool(ark.naan).schema_version >= 1
+        if not unique_indexes:
+            with get_pool(ark.naan).reader() as con:
+                record = con.execute(
+                    "select * from arks where identifier = :a_s",
+                    {"a_s": ark.identifier},
+                ).fetchone()
+            if record is not None:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Identifier {ark.identifier} already in use.",
+                )
+    except sqlite3.DatabaseError as e:
+        log_request(
+            "ERROR",
+            request.client.host,
+            ark.ark_string,
+            request.headers,
+            authorization,
+            str(e),
         )
+        raise HTTPException(status_code=500)
 
-    # Validate identifer if provided.
-    if ark.identifier is not None and len(ark.identifier) == 36:
-        if validate_uuid(ark.identifier) is True:
-            ark.identifier = generate_identifier(uuid=ark.identifier)
-        else:
-            raise HTTPException(
-                status_code=422,
-                detail=f"Provided UUID {ark.identifier} is invalid.",
-            )
-    elif ark.identifier is not None and len(ark.identifier) == 12:
-        if validate_identifier(ark.identifier) is False:
-            raise HTTPException(
-                status_code=422,
-                detail=f"Provided identifier {ark.identifier} is invalid.",
-            )
-    elif ark.identifier is not None and validate_identifier(ark.identifier) is False:
-        raise HTTPException(
-            status_code=422,
-            detail=f"Provided identifier {ark.identifier} is invalid.",
-        )
-    else:
-        ark.identifier = generate_identifier()
+    # See if provided 'target' value is already being used.
+    if not unique_indexes:
+        check_target_already_registered(ark, request, authorization)
 
-    # See if provided identifier is already being used.
     try:
-        con = sqlite3.connect(config[ark.naan]["sqlite_db_path"])
-        con.row_factory = sqlite3.Row
-        cur = con.cursor()
-        cur.execute(
-            "select * from arks where identifier = :a_s", {"a_s": ark.identifier}
-        )
-        record = cur.fetchone()
-        if record is not None:
-            con.close()
-            raise HTTPException(
-                status_code=409,
-                detail=f"Identifier {ark.identifier} already in use.",
+        with get_pool(ark.naan).writer() as con:
+            con.execute(
+                "insert into arks values (datetime(), datetime(), ?,?,?,?,?,?,?,?,?)",
+                get_ark_data(ark),
             )
-        con.close()
+        get_cache(ark.naan).invalidate(ark.ark_string)
+    except sqlite3.IntegrityError as e:
+        raise HTTPException(status_code=409, detail=get_integrity_error_detail(e, ark))
     except sqlite3.DatabaseError as e:
         log_request(
             "ERROR",
@@ -374,90 +829,207 @@ def create_ark(
         )
         raise HTTPException(status_code=500)
 
-    # See if provided 'target' value is already being used.
-    if ark.target is None:
-        ark.target = ""
-    else:
-        check_target_already_registered(ark, request, authorization)
+    urls = get_ark_urls(ark.naan, ark.ark_string)
 
-    # Assemble the ARK. Generate parts the client didn't provide.
-    if ark.naan is None:
-        ark.naan = config[ark.naan]["naan"]
-    if ark.shoulder is None:
-        ark.shoulder = config[ark.naan]["default_shoulder"]
-    if ark.identifier is None:
-        ark.identifier = generate_identifier()
+    log_request(
+        "INFO",
+        request.client.host,
+        ark.ark_string,
+        request.headers,
+        authorization,
+        "ARK created.",
+    )
 
-    ark.ark_string = f"ark:{ark.naan}/{ark.shoulder}{ark.identifier}"
+    ark.where = get_erc_where_value(ark.naan, ark.ark_string)
+    # Delete the NAAN because we do not return it to the requesting client.
+    del ark.naan
+    return {"ark": ark, "urls": urls}
 
-    if ark.who is None:
-        ark.who = config[ark.naan]["erc_metadata_defaults"]["who"]
-    if ark.what is None:
-        ark.what = config[ark.naan]["erc_metadata_defaults"]["what"]
-    if ark.when is None:
-        ark.when = config[ark.naan]["erc_metadata_defaults"]["when"]
-    if ark.policy is None:
-        if ark.shoulder in config[ark.naan]["commitment_statements"].keys():
-            ark.policy = config[ark.naan]["commitment_statements"][ark.shoulder]
-        else:
-            ark.policy = config[ark.naan]["commitment_statements"]["default"]
 
-    ark.where = ark.ark_string
+@app.post("/larkm/batch")
+def create_arks(
+    request: Request,
+    batch: ArkBatch,
+    authorization: Annotated[str | None, Header()] = None,
+):
+    """
+    Create/mint many ARKs in a single request. Each ARK in "arks" is validated using
+    the same rules as when creating a single ARK, and may omit the NAAN, which is
+    taken from the batch. ARKs that pass validation and whose identifier and target
+    are not already in use are inserted in a single database transaction. Sample request:
+
+    curl -v -X POST "http://127.0.0.1:8000/larkm/batch" \
+        -H 'Content-Type: application/json' \
+        -d '{"naan": "99999", "arks": [{"target": "https://example.com/1"}, {"shoulder": "x1", "target": "https://example.com/2"}]}'
+
+    The response contains a result for each ARK, in the order they were provided. Each
+    result has a "status_code", which is 201 for ARKs that were created, and either the
+    "ark" and "urls" that would be returned when creating a single ARK or, for ARKs that
+    were not created, a "detail" describing the problem.
 
+    - **batch**: the NAAN and the ARKs to create.
+    """
+    check_access(request, batch.naan, authorization)
+
+    results = [None] * len(batch.arks)
+    arks_to_create = dict()
+    for i, ark in enumerate(batch.arks):
+        if ark.naan is None:
+            ark.naan = batch.naan
+        if ark.naan != batch.naan:
+            results[i] = {
+                "status_code": 422,
+                "detail": "Provided NAAN does not match the batch's NAAN.",
+            }
+            continue
+        try:
+            arks_to_create[i] = assemble_ark(ark)
+        except HTTPException as e:
+            results[i] = {"status_code": e.status_code, "detail": e.detail}
+
+    # Look up all the identifiers and targets in a few queries, and check the ARKs
+    # in the batch against each other.
     try:
-        ark_data = (
-            ark.shoulder,
-            ark.identifier,
-            ark.ark_string,
-            ark.target,
-            ark.who,
-            ark.what,
-            ark.when,
-            ark.where,
-            ark.policy,
+        used_identifiers = find_existing_values(
+            batch.naan,
+            "identifier",
+            [ark.identifier for ark in arks_to_create.values()],
         )
-        con = sqlite3.connect(config[ark.naan]["sqlite_db_path"])
-        cur = con.cursor()
-        cur.execute(
-            "insert into arks values (datetime(), datetime(), ?,?,?,?,?,?,?,?,?)",
-            ark_data,
+        used_targets = find_existing_values(
+            batch.naan,
+            "target",
+            [ark.target for ark in arks_to_create.values() if len(ark.target) > 0],
         )
-        con.commit()
-        con.close()
     except sqlite3.DatabaseError as e:
         log_request(
             "ERROR",
             request.client.host,
-            ark.ark_string,
+            "/larkm/batch",
             request.headers,
             authorization,
             str(e),
+            naan=batch.naan,
         )
         raise HTTPException(status_code=500)
 
-    urls = dict()
-    if len(config[ark.naan]["resolver_hosts"]["local"]) > 0:
-        urls["local"] = (
-            f'{config[ark.naan]["resolver_hosts"]["local"].rstrip("/")}/{ark.ark_string}'
+    for i, ark in list(arks_to_create.items()):
+        if ark.identifier in used_identifiers:
+            detail = f"Identifier {ark.identifier} already in use."
+        elif ark.target in used_targets:
+            detail = f"'target' value {ark.target} already in use."
+        else:
+            used_identifiers.add(ark.identifier)
+            if len(ark.target) > 0:
+                used_targets.add(ark.target)
+            continue
+        results[i] = {"status_code": 409, "detail": detail}
+        del arks_to_create[i]
+
+    try:
+        with get_pool(batch.naan).writer() as con:
+            for i, ark in list(arks_to_create.items()):
+                try:
+                    con.execute(
+                        "insert into arks values (datetime(), datetime(), ?,?,?,?,?,?,?,?,?)",
+                        get_ark_data(ark),
+                    )
+                except sqlite3.IntegrityError as e:
+                    results[i] = {
+                        "status_code": 409,
+                        "detail": get_integrity_error_detail(e, ark),
+                    }
+                    del arks_to_create[i]
+    except sqlite3.DatabaseError as e:
+        log_request(
+            "ERROR",
+            request.client.host,
+            "/larkm/batch",
+            request.headers,
+            authorization,
+            str(e),
+            naan=batch.naan,
         )
-    if len(config[ark.naan]["resolver_hosts"]["global"]) > 0:
-        urls["global"] = (
-            f'{config[ark.naan]["resolver_hosts"]["global"].rstrip("/")}/{ark.ark_string}'
+        raise HTTPException(status_code=500)
+
+    cache = get_cache(batch.naan)
+    for i, ark in arks_to_create.items():
+        cache.invalidate(ark.ark_string)
+        log_request(
+            "INFO",
+            request.client.host,
+            ark.ark_string,
+            request.headers,
+            authorization,
+            "ARK created.",
         )
+        urls = get_ark_urls(ark.naan, ark.ark_string)
+        ark.where = get_erc_where_value(ark.naan, ark.ark_string)
+        # Delete the NAAN because we do not return it to the requesting client.
+        del ark.naan
+        results[i] = {"status_code": 201, "ark": ark, "urls": urls}
 
     log_request(
         "INFO",
         request.client.host,
-        ark.ark_string,
+        "/larkm/batch",
         request.headers,
         authorization,
-        "ARK created.",
+        f"{len(arks_to_create)} of {len(batch.arks)} ARKs in batch created.",
+        naan=batch.naan,
     )
 
-    ark.where = get_erc_where_value(ark.naan, ark.ark_string)
-    # Delete the NAAN because we do not return it to the requesting client.
-    del ark.naan
-    return {"ark": ark, "urls": urls}
+    return {
+        "num_created": len(arks_to_create),
+        "num_failed": len(batch.arks) - len(arks_to_create),
+        "results": results,
+    }
+
+
+@app.post("/larkm/lookup")
+async def lookup_arks(
+    request: Request,
+    naan: str,
+    authorization: Annotated[str | None, Header()] = None,
+):
+    """
+    Look up many ARKs at once, for example to check for broken links. The request body
+    is either a JSON object with an "ark_strings" list, or (with the Content-Type
+    application/x-ndjson) newline-delimited JSON with one ARK string, or object with
+    an "ark_string", per line. Sample requests:
+
+    curl -X POST "http://127.0.0.1:8000/larkm/lookup?naan=12345" \
+        -H 'Content-Type: application/json' \
+        -d '{"ark_strings": ["ark:12345/x9062cdde7f9d6", "ark:12345/x9062cdde7f111"]}'
+
+    curl -X POST "http://127.0.0.1:8000/larkm/lookup?naan=12345" \
+        -H 'Content-Type: application/x-ndjson' --data-binary @ark_strings.ndjson
+
+    The response is newline-delimited JSON containing one object per ARK, in the order
+    they were provided, with "ark_string" and "exists" keys and, for ARKs that exist,
+    the ARK's "target" and ERC metadata.
+
+    - **naan**: the NAAN of the ARKs to look up.
+    """
+    check_access(request, naan, authorization)
+
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        ark_strings = read_ndjson_ark_strings(request.stream())
+    else:
+        try:
+            body = await request.json()
+            ark_strings = body["ark_strings"]
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(
+                status_code=422,
+                detail='Request body must be a JSON object with an "ark_strings" list.',
+            )
+        if not isinstance(ark_strings, list):
+            raise HTTPException(status_code=422, detail='"ark_strings" must be a list.')
+
+    return StreamingResponse(
+        lookup_results(request, naan, ark_strings, authorization),
+        media_type="application/x-ndjson",
+    )
 
 
 @app.patch("/larkm/ark:{naan}/{identifier}")
@@ -509,15 +1081,12 @@ def update_ark(
         )
 
     try:
-        con = sqlite3.connect(config[naan]["sqlite_db_path"])
-        con.row_factory = sqlite3.Row
-        cur = con.cursor()
-        cur.execute("select * from arks where ark_string = :a_s", {"a_s": ark_string})
-        record = cur.fetchone()
+        with get_pool(naan).reader() as con:
+            record = con.execute(
+                "select * from arks where ark_string = :a_s", {"a_s": ark_string}
+            ).fetchone()
         if record is None:
-            con.close()
             raise HTTPException(status_code=404, detail="ARK not found")
-        con.close()
     except sqlite3.DatabaseError as e:
         log_request(
             "ERROR",
@@ -548,7 +1117,8 @@ def update_ark(
     else:
         original_properties["target"] = old_ark["target"]
         updated_properties["target"] = ark.target
-    check_target_already_registered(ark, request, authorization)
+    if get_pool(naan).schema_version < 1:
+        check_target_already_registered(ark, request, authorization)
     if ark.who is None:
         ark.who = old_ark["erc_who"]
     else:
@@ -586,14 +1156,12 @@ def update_ark(
             ark.ark_string,
         )
 
-        con = sqlite3.connect(config[naan]["sqlite_db_path"])
-        cur = con.cursor()
-        cur.execute(
-            "update arks set date_modified = datetime(), shoulder = ?, identifier = ?, ark_string = ?, target = ?, erc_who = ?, erc_what = ?, erc_when = ?, erc_where = ?, policy = ? where ark_string = ?",
-            ark_data,
-        )
-        con.commit()
-        con.close()
+        with get_pool(naan).writer() as con:
+            con.execute(
+                "update arks set date_modified = datetime(), shoulder = ?, identifier = ?, ark_string = ?, target = ?, erc_who = ?, erc_what = ?, erc_when = ?, erc_where = ?, policy = ? where ark_string = ?",
+                ark_data,
+            )
+        get_cache(naan).invalidate(ark_string)
         log_request(
             "INFO",
             request.client.host,
@@ -603,6 +1171,8 @@ def update_ark(
             f"ARK updated: {original_properties} updated to {updated_properties}",
             naan=naan,
         )
+    except sqlite3.IntegrityError as e:
+        raise HTTPException(status_code=409, detail=get_integrity_error_detail(e, ark))
     except sqlite3.DatabaseError as e:
         log_request(
             "ERROR",
@@ -615,15 +1185,7 @@ def update_ark(
         )
         raise HTTPException(status_code=500)
 
-    urls = dict()
-    if len(config[naan]["resolver_hosts"]["local"]) > 0:
-        urls["local"] = (
-            f'{config[naan]["resolver_hosts"]["local"].rstrip("/")}/{ark.ark_string}'
-        )
-    if len(config[naan]["resolver_hosts"]["global"]) > 0:
-        urls["global"] = (
-            f'{config[naan]["resolver_hosts"]["global"].rstrip("/")}/{ark.ark_string}'
-        )
+    urls = get_ark_urls(naan, ark.ark_string)
 
     ark.where = get_erc_where_value(ark.naan, ark.ark_string)
     # Delete the NAAN because we do not return it to the requesting client.
@@ -651,16 +1213,13 @@ def delete_ark(
     ark_string = f"ark:{naan}/{identifier}"
 
     try:
-        con = sqlite3.connect(config[naan]["sqlite_db_path"])
-        cur = con.cursor()
-        cur.execute(
-            "select ark_string from arks where ark_string = :a_s", {"a_s": ark_string}
-        )
-        record = cur.fetchone()
+        with get_pool(naan).reader() as con:
+            record = con.execute(
+                "select ark_string from arks where ark_string = :a_s",
+                {"a_s": ark_string},
+            ).fetchone()
         if record is None:
-            con.close()
             raise HTTPException(status_code=404, detail="ARK not found")
-        con.close()
     except sqlite3.DatabaseError as e:
         log_request(
             "ERROR",
@@ -675,11 +1234,11 @@ def delete_ark(
     # If ARK found, delete it.
     else:
         try:
-            con = sqlite3.connect(config[naan]["sqlite_db_path"])
-            cur = con.cursor()
-            cur.execute("delete from arks where ark_string=:a_s", {"a_s": ark_string})
-            con.commit()
-            con.close()
+            with get_pool(naan).writer() as con:
+                con.execute(
+                    "delete from arks where ark_string=:a_s", {"a_s": ark_string}
+                )
+            get_cache(naan).invalidate(ark_string)
             log_request(
                 "INFO",
                 request.client.host,
@@ -822,19 +1381,16 @@ def search_arks(
         # We have retrieved identifiers from the Woosh index, now we get the full ARK records from the
         # database to return to the user.
         try:
-            con = sqlite3.connect(config[naan]["sqlite_db_path"])
-            con.row_factory = sqlite3.Row
-            cur = con.cursor()
             identifier_list_string = ",".join(f'"{i}"' for i in identifier_list)
             # identifier_list_string is safe to use here since it is not user input, it is
             # validated using a regex at the time of creation in create_ark().
-            cur.execute(
-                "select * from arks where identifier IN ("
-                + identifier_list_string
-                + ")"
-            )
-            arks = cur.fetchmany(len(identifier_list))
-            con.close()
+            with get_pool(naan).reader() as con:
+                cur = con.execute(
+                    "select * from arks where identifier IN ("
+                    + identifier_list_string
+                    + ")"
+                )
+                arks = cur.fetchmany(len(identifier_list))
         except sqlite3.DatabaseError as e:
             log_request(
                 "ERROR",
@@ -900,6 +1456,8 @@ def return_config(
     del subset["sqlite_db_path"]
     del subset["log_file_path"]
     del subset["whoosh_index_dir_path"]
+    subset.pop("sqlite_pool", None)
+    subset.pop("resolution_cache", None)
 
     log_request(
         "INFO",
@@ -914,17 +1472,304 @@ def return_config(
     return subset
 
 
+@app.get("/larkm/stats/{naan}")
+def return_stats(
+    request: Request, naan: str, authorization: Annotated[str | None, Header()] = None
+):
+    """
+    Returns runtime statistics, such as database connection pool and resolution
+    cache usage, for the NAAN.
+
+    curl "http://127.0.0.1:8000/larkm/stats/99999"
+
+    - **naan**: the NAAN.
+    """
+    check_access(request, naan, authorization)
+
+    return {
+        "sqlite_pool": get_pool(naan).stats(),
+        "resolution_cache": get_cache(naan).stats(),
+        "log_writer": log_writer.stats(),
+    }
+
+
+def assemble_ark(ark):
+    """
+    Validates a new ARK against its NAAN's configuration and fills in the parts of
+    the ARK the client didn't provide. Raises an HTTPException if the ARK is invalid.
+
+    - **ark**: the Ark to create. Its NAAN must be configured.
+    """
+    if (
+        config[ark.naan]["default_shoulder"]
+        not in config[ark.naan]["allowed_shoulders"]
+    ):
+        config[ark.naan]["allowed_shoulders"].insert(
+            0, config[ark.naan]["default_shoulder"]
+        )
+
+    # Validate shoulder if provided.
+    if ark.shoulder is not None:
+        if ark.shoulder not in config[ark.naan]["allowed_shoulders"]:
+            raise HTTPException(status_code=422, detail="Provided shoulder is invalid.")
+
+    # Validate NAAN.
+    if ark.naan is not None:
+        if ark.naan != config[ark.naan]["naan"]:
+            raise HTTPException(status_code=422, detail="Provided NAAN is invalid.")
+
+    if (
+        ark.policy is not None
+        and config[ark.naan]["constrain_commitment_statements"] == "yes"
+    ):
+        raise HTTPException(
+            status_code=422, detail="Providing a policy is not allowed."
+        )
+
+    # Validate identifer if provided.
+    if ark.identifier is not None and len(ark.identifier) == 36:
+        if validate_uuid(ark.identifier) is True:
+            ark.identifier = generate_identifier(uuid=ark.identifier)
+        else:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Provided UUID {ark.identifier} is invalid.",
+            )
+    elif ark.identifier is not None and len(ark.identifier) == 12:
+        if validate_identifier(ark.identifier) is False:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Provided identifier {ark.identifier} is invalid.",
+            )
+    elif ark.identifier is not None and validate_identifier(ark.identifier) is False:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Provided identifier {ark.identifier} is invalid.",
+        )
+    else:
+        ark.identifier = generate_identifier()
+
+    # Assemble the ARK. Generate parts the client didn't provide.
+    if ark.target is None:
+        ark.target = ""
+    if ark.shoulder is None:
+        ark.shoulder = config[ark.naan]["default_shoulder"]
+
+    ark.ark_string = f"ark:{ark.naan}/{ark.shoulder}{ark.identifier}"
+
+    if ark.who is None:
+        ark.who = config[ark.naan]["erc_metadata_defaults"]["who"]
+    if ark.what is None:
+        ark.what = config[ark.naan]["erc_metadata_defaults"]["what"]
+    if ark.when is None:
+        ark.when = config[ark.naan]["erc_metadata_defaults"]["when"]
+    if ark.policy is None:
+        if ark.shoulder in config[ark.naan]["commitment_statements"].keys():
+            ark.policy = config[ark.naan]["commitment_statements"][ark.shoulder]
+        else:
+            ark.policy = config[ark.naan]["commitment_statements"]["default"]
+
+    ark.where = ark.ark_string
+
+    return ark
+
+
+def get_ark_data(ark):
+    """
+    Returns the values to insert into the arks table for an assembled ARK, in
+    column order, without the two date columns.
+
+    - **ark**: the Ark, as returned by assemble_ark().
+    """
+    return (
+        ark.shoulder,
+        ark.identifier,
+        ark.ark_string,
+        ark.target,
+        ark.who,
+        ark.what,
+        ark.when,
+        ark.where,
+        ark.policy,
+    )
+
+
+def get_ark_urls(naan, ark_string):
+    """
+    Returns the ARK's URLs at the NAAN's local and global resolvers.
+
+    - **naan**: the NAAN.
+    - **ark_string**: the ARK as a string, i.e., ark:{naan}/{identifier}
+    """
+    urls = dict()
+    if len(config[naan]["resolver_hosts"]["local"]) > 0:
+        urls["local"] = (
+            f'{config[naan]["resolver_hosts"]["local"].rstrip("/")}/{ark_string}'
+        )
+    if len(config[naan]["resolver_hosts"]["global"]) > 0:
+        urls["global"] = (
+            f'{config[naan]["resolver_hosts"]["global"].rstrip("/")}/{ark_string}'
+        )
+    return urls
+
+
+def find_existing_values(naan, column, values, chunk_size=500):
+    """
+    Returns the set of values that are already present in a column of the arks table,
+    querying the values in chunks so large lists stay within SQLite's limit on the
+    number of query parameters. Can raise sqlite3.DatabaseError.
+
+    - **naan**: the NAAN.
+    - **column**: the column to check, either "identifier", "ark_string" or "target".
+    - **values**: the values to look for.
+    - **chunk_size**: the number of values to check per query.
+    """
+    if column not in ["identifier", "ark_string", "target"]:
+        raise ValueError(f"Column {column} cannot be searched for existing values.")
+
+    values = list(set(values))
+    existing_values = set()
+    with get_pool(naan).reader() as con:
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start : start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = con.execute(
+                f"select {column} from arks where {column} in ({placeholders})", chunk
+            )
+            existing_values.update(row[0] for row in rows)
+    return existing_values
+
+
+async def read_ndjson_ark_strings(body):
+    """
+    Yields the ARK strings in a newline-delimited JSON request body as it is received.
+    Each line is either a JSON string or an object with an "ark_string" key; lines
+    that are neither are yielded as they are, and reported as invalid.
+
+    - **body**: the request body, as an async iterator of bytes.
+    """
+    buffer = b""
+    async for data in body:
+        buffer = buffer + data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if len(line.strip()) > 0:
+                yield parse_ndjson_ark_string(line)
+    if len(buffer.strip()) > 0:
+        yield parse_ndjson_ark_string(buffer)
+
+
+def parse_ndjson_ark_string(line):
+    try:
+        value = json.loads(line)
+    except ValueError:
+        return line.decode("utf-8", errors="replace")
+    if isinstance(value, dict):
+        return value.get("ark_string")
+    return value
+
+
+async def lookup_results(request, naan, ark_strings, authorization, chunk_size=500):
+    """
+    Yields a line of newline-delimited JSON describing each ARK, looking the ARKs up
+    chunk_size at a time.
+
+    - **request**: The Request object.
+    - **naan**: the NAAN.
+    - **ark_strings**: the ARK strings to look up, either a list or an async iterator.
+    - **authorization**: The "authorization" header, Annotated[str | None, Header()]
+    - **chunk_size**: the number of ARKs to look up at a time.
+    """
+    num_looked_up = 0
+    chunk = []
+    try:
+        if isinstance(ark_strings, list):
+            for start in range(0, len(ark_strings), chunk_size):
+                chunk = ark_strings[start : start + chunk_size]
+                yield await run_in_threadpool(lookup_ark_strings, naan, chunk)
+                num_looked_up += len(chunk)
+        else:
+            async for ark_string in ark_strings:
+                chunk.append(ark_string)
+                if len(chunk) == chunk_size:
+                    yield await run_in_threadpool(lookup_ark_strings, naan, chunk)
+                    num_looked_up += len(chunk)
+                    chunk = []
+            if len(chunk) > 0:
+                yield await run_in_threadpool(lookup_ark_strings, naan, chunk)
+                num_looked_up += len(chunk)
+    except sqlite3.DatabaseError as e:
+        log_request(
+            "ERROR",
+            request.client.host,
+            "/larkm/lookup",
+            request.headers,
+            authorization,
+            str(e),
+            naan=naan,
+        )
+        # The response has already started, so report the error in the body.
+        yield json.dumps({"detail": "Internal Server Error"}) + "\n"
+        return
+
+    log_request(
+        "INFO",
+        request.client.host,
+        "/larkm/lookup",
+        request.headers,
+        authorization,
+        f"{num_looked_up} ARKs looked up.",
+        naan=naan,
+    )
+
+
+def lookup_ark_strings(naan, ark_strings):
+    """
+    Returns the newline-delimited JSON results for a chunk of ARK strings. ARK
+    strings that are not valid ARKs in the NAAN are reported as not existing. Can
+    raise sqlite3.DatabaseError.
+
+    - **naan**: the NAAN.
+    - **ark_strings**: the ARK strings to look up.
+    """
+    # Both "ark:12345/..." and "ark:/12345/..." forms are accepted.
+    normalized = dict()
+    for ark_string in ark_strings:
+        if isinstance(ark_string, str) and get_naan_from_ark_string(ark_string) == naan:
+            normalized[ark_string] = ark_string.replace("ark:/", "ark:", 1)
+    records = get_ark_records(naan, normalized.values())
+
+    lines = []
+    for ark_string in ark_strings:
+        record = None
+        if isinstance(ark_string, str):
+            record = records.get(normalized.get(ark_string))
+        if record is None:
+            result = {"ark_string": ark_string, "exists": False}
+        else:
+            result = {
+                "ark_string": ark_string,
+                "exists": True,
+                "target": record["target"],
+                "who": record["erc_who"],
+                "what": record["erc_what"],
+                "when": record["erc_when"],
+                "where": get_erc_where_value(naan, record["erc_where"]),
+                "policy": record["policy"],
+            }
+        lines.append(json.dumps(result) + "\n")
+    return "".join(lines)
+
+
 def check_target_already_registered(ark, request, authorization):
     # We allow empty targets.
     if ark.target is None or len(ark.target) == 0:
         return
     try:
-        con = sqlite3.connect(config[ark.naan]["sqlite_db_path"])
-        con.row_factory = sqlite3.Row
-        cur = con.cursor()
-        cur.execute("select * from arks where target = :a_s", {"a_s": ark.target})
-        records = cur.fetchall()
-        con.close()
+        with get_pool(ark.naan).reader() as con:
+            records = con.execute(
+                "select * from arks where target = :a_s", {"a_s": ark.target}
+            ).fetchall()
         # We allow the current ARK to use that target, but only the current ARK.
         # So we need to see if there are any others before thowing the exception.
         if len(records) > 0:
@@ -951,32 +1796,32 @@ def check_target_already_registered(ark, request, authorization):
         raise HTTPException(status_code=500)
 
 
-def get_info_content(ark_string):
+def get_integrity_error_detail(error, ark):
+    """
+    Returns the message to send to the client when writing an ARK violates one of
+    the unique indexes added in schema version 1.
+
+    - **error**: the sqlite3.IntegrityError.
+    - **ark**: the Ark being written.
+    """
+    if "arks.target" in str(error):
+        return f"'target' value {ark.target} already in use."
+    else:
+        return f"Identifier {ark.identifier} already in use."
+
+
+def get_info_content(ark_string, record):
     """
     Assembles the content to return in response to a ?info request.
 
     - **ark_string**: the ARK as a string, i.e., ark:{naan}/{identifier}
+    - **record**: the ARK's record, as returned by get_ark_record().
     """
     naan = get_naan_from_ark_string(ark_string)
 
-    try:
-        con = sqlite3.connect(config[naan]["sqlite_db_path"])
-        con.row_factory = sqlite3.Row
-        cur = con.cursor()
-        cur.execute(
-            "select erc_who, erc_what, erc_when, erc_where, policy from arks where ark_string = :a_s",
-            {"a_s": ark_string},
-        )
-        record = cur.fetchone()
-        if record is None:
-            return None
-        con.close()
-    except sqlite3.DatabaseError as e:
-        return e
-
-    erc = f"erc:\nwho: {record[0]}\nwhat: {record[1]}\nwhen: {record[2]}\nwhere: {get_erc_where_value(naan, record[3])}\n"
-    if len(record[4]) > 0:
-        policy = f"policy: {record[4]}"
+    erc = f"erc:\nwho: {record['erc_who']}\nwhat: {record['erc_what']}\nwhen: {record['erc_when']}\nwhere: {get_erc_where_value(naan, record['erc_where'])}\n"
+    if len(record["policy"]) > 0:
+        policy = f"policy: {record['policy']}"
     else:
         for sh in config[naan]["allowed_shoulders"]:
             if ark_string.startswith(sh):
@@ -991,7 +1836,7 @@ def log_request(
     level, client_ip, ark_string, request_headers, auth_key, event_details, naan=None
 ):
     """
-    Assembles a tab-delmited log entry and writes it to the log file.
+    Assembles a tab-delmited log entry and queues it to be written to the NAAN's log file.
 
     - **level**: INFO, WARNING, or ERROR from the standard Python logging levels.
     - **client_ip**: the IP address of the client triggering the event.
@@ -1002,6 +1847,14 @@ def log_request(
     - **event_details**: a brief description of the event.
     - **naan**: the NAAN.
     """
+    if naan is None:
+        naan = get_naan_from_ark_string(ark_string)
+
+    # Logging is disabled for this NAAN, or the NAAN isn't configured at all.
+    log_file_path = config.get(naan, dict()).get("log_file_path")
+    if not log_file_path:
+        return
+
     if "referer" in request_headers:
         referer = request_headers["referer"]
     else:
@@ -1012,25 +1865,11 @@ def log_request(
     else:
         api_key_suffix = auth_key[-4:]
 
-    if naan is None:
-        naan = get_naan_from_ark_string(ark_string)
-
     now = datetime.now()
     date_format = "%Y-%m-%d %H:%M:%S"
 
     entry = f"{now.strftime(date_format)}\t{client_ip}\t{api_key_suffix}\t{referer}\t{ark_string}\t{event_details}"
-    logging.basicConfig(
-        level=logging.INFO,
-        filename=config[naan]["log_file_path"],
-        filemode="a",
-        format="%(message)s",
-    )
-    if level == "ERROR":
-        logging.error(entry)
-    elif level == "WARNING":
-        logging.warning(entry)
-    else:
-        logging.info(entry)
+    log_writer.write(log_file_path, entry)
 
 
 def generate_identifier(uuid=None):
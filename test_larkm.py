@@ -1,5 +1,15 @@
 from fastapi.testclient import TestClient
-from larkm import app, get_naan_from_ark_string
+from larkm import (
+    app,
+    get_naan_from_ark_string,
+    ConnectionPool,
+    ResolutionCache,
+    RequestLogWriter,
+    log_writer,
+    upgrade_database,
+)
+import sqlite3
+import json
 import shutil
 import os
 import re
@@ -18,11 +28,15 @@ def setup_module(module):
         "fixtures/index_dir/MAIN_6ydemc1f3h6z75lb.seg",
     )
     shutil.copyfile("fixtures/larkmtest.db.bak", "fixtures/larkmtest.db")
+    # NAAN 33333 uses a copy of the test database upgraded to the latest schema version.
+    shutil.copyfile("fixtures/larkmtest.db.bak", "fixtures/larkmtest_upgraded.db")
+    upgrade_database("fixtures/larkmtest_upgraded.db")
 
 
 # Remove SQLite db that will have been altered during testing.
 def teardown_module(module):
     os.remove("fixtures/larkmtest.db")
+    os.remove("fixtures/larkmtest_upgraded.db")
 
 
 # Test the redirect functionality and other aspects of ARK resolution.
@@ -459,6 +473,92 @@ def test_create_ark():
     assert response.status_code == 409
 
 
+def test_create_arks_batch():
+    response = client.post(
+        "/larkm/batch",
+        json={
+            "naan": "99999",
+            "arks": [
+                {"identifier": "7f3e2a1b9c0d", "target": "https://example.com/batch1"},
+                {"shoulder": "x9", "target": "https://example.com/batch2"},
+                # Identifier already used in this batch.
+                {"identifier": "7f3e2a1b9c0d", "target": "https://example.com/batch3"},
+                # Identifier already in the database.
+                {"identifier": "cea8e7f31c84", "target": "https://example.com/batch4"},
+                # Target already in the database.
+                {"target": "http://example.com/15"},
+                {"identifier": "80304d63ac0k"},
+                {"naan": "12345", "target": "https://example.com/batch5"},
+                {},
+                {},
+            ],
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["num_created"] == 4
+    assert body["num_failed"] == 5
+    assert [result["status_code"] for result in body["results"]] == [
+        201,
+        201,
+        409,
+        409,
+        409,
+        422,
+        422,
+        201,
+        201,
+    ]
+    assert body["results"][0] == {
+        "status_code": 201,
+        "ark": {
+            "shoulder": "s1",
+            "identifier": "7f3e2a1b9c0d",
+            "ark_string": "ark:99999/s17f3e2a1b9c0d",
+            "target": "https://example.com/batch1",
+            "who": ":at",
+            "what": ":at",
+            "when": ":at",
+            "where": "https://resolver.myorg.net/ark:99999/s17f3e2a1b9c0d",
+            "policy": "ACME University commits to maintain ARKs that have 's1' as a shoulder for a long time.",
+        },
+        "urls": {
+            "local": "https://resolver.myorg.net/ark:99999/s17f3e2a1b9c0d",
+            "global": "https://n2t.net/ark:99999/s17f3e2a1b9c0d",
+        },
+    }
+    assert body["results"][2]["detail"] == "Identifier 7f3e2a1b9c0d already in use."
+    assert body["results"][4]["detail"] == (
+        "'target' value http://example.com/15 already in use."
+    )
+    assert (
+        body["results"][5]["detail"] == "Provided identifier 80304d63ac0k is invalid."
+    )
+
+    response = client.get(
+        f'/{body["results"][1]["ark"]["ark_string"]}', follow_redirects=False
+    )
+    assert response.headers["location"] == "https://example.com/batch2"
+
+    # Batches work the same way with databases that have unique indexes.
+    response = client.post(
+        "/larkm/batch",
+        json={"naan": "33333", "arks": [{"target": "https://example.com/batch6"}]},
+    )
+    assert response.json()["num_created"] == 1
+    response = client.post(
+        "/larkm/batch",
+        json={"naan": "33333", "arks": [{"target": "https://example.com/batch6"}]},
+    )
+    assert response.json()["results"][0]["status_code"] == 409
+
+    response = client.post(
+        "/larkm/batch",
+        json={"naan": "11111", "arks": [{}]},
+    )
+    assert response.status_code == 403
+
+
 def test_update_ark():
     # Create an ARK to update.
     response = client.post(
@@ -699,6 +799,68 @@ def test_delete_ark():
     assert delete_response.status_code == 204
 
 
+def test_lookup_arks():
+    ark_strings = [
+        "ark:12345/x9062cdde7f9d6",
+        "ark:/99999/s1cea8e7f31c84",
+        "ark:99999/s1cea8e7f31c84",
+        "ark:12345/x9062cdde7f111",
+        "ark:99999/s1cea8e7f31c84x",
+        {"not": "an ARK string"},
+    ]
+    response = client.post(
+        "/larkm/lookup?naan=99999", json={"ark_strings": ark_strings}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result["exists"] for result in results] == [
+        False,
+        True,
+        True,
+        False,
+        False,
+        False,
+    ]
+    # ARKs from another NAAN aren't looked up.
+    assert results[0] == {"ark_string": "ark:12345/x9062cdde7f9d6", "exists": False}
+    assert results[2] == {
+        "ark_string": "ark:99999/s1cea8e7f31c84",
+        "exists": True,
+        "target": "http://example.com/15",
+        "who": "Derex Godfry",
+        "what": "5 Ways to Immediately Start Selling WATER",
+        "when": ":at",
+        "where": "https://resolver.myorg.net/ark:99999/s1cea8e7f31c84",
+        "policy": "Random policy generators generally suck.",
+    }
+
+    # Newline-delimited JSON request bodies.
+    body = (
+        '"ark:12345/x9062cdde7f9d6"\n{"ark_string": "ark:12345/x9062cdde7f111"}\nfoo\n'
+    )
+    response = client.post(
+        "/larkm/lookup?naan=12345",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result["ark_string"] for result in results] == [
+        "ark:12345/x9062cdde7f9d6",
+        "ark:12345/x9062cdde7f111",
+        "foo",
+    ]
+    assert results[0]["target"] == "https://example.com/foo"
+    assert [result["exists"] for result in results] == [True, False, False]
+
+    response = client.post("/larkm/lookup?naan=99999", json=ark_strings)
+    assert response.status_code == 422
+
+    response = client.post("/larkm/lookup?naan=11111", json={"ark_strings": []})
+    assert response.status_code == 403
+
+
 def test_search_arks():
     # Do a search that returns no ARKs.
     response = client.get("/larkm/search?naan=99999&q=policy%3Axxxxxxxx")
@@ -798,6 +960,226 @@ def test_get_config():
     }
 
 
+def test_get_stats():
+    response = client.get("/larkm/stats/99999")
+    assert response.status_code == 200
+    pool_stats = response.json()["sqlite_pool"]
+    assert pool_stats["db_path"] == "fixtures/larkmtest.db"
+    assert pool_stats["reader_checkouts"] > 0
+    assert pool_stats["write_transactions"] > 0
+    assert pool_stats["reader_connections"] <= pool_stats["size"]
+
+    response = client.get("/larkm/stats/11111")
+    assert response.status_code == 403
+
+
+def test_connection_pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2, wal_mode=True)
+    with pool.writer() as con:
+        con.execute("create table t(x TEXT NOT NULL)")
+        con.execute("insert into t values ('a')")
+
+    # A failed write is rolled back.
+    try:
+        with pool.writer() as con:
+            con.execute("insert into t values ('b')")
+            con.execute("insert into t values (NULL)")
+    except Exception:
+        pass
+
+    with pool.reader() as con1, pool.reader() as con2:
+        assert con1 is not con2
+        assert con1.execute("select count(*) from t").fetchone()[0] == 1
+        assert con1.execute("pragma journal_mode").fetchone()[0] == "wal"
+
+    assert pool.stats()["reader_connections"] == 2
+    assert pool.stats()["idle_readers"] == 2
+    assert pool.stats()["write_transactions"] == 1
+    pool.close()
+
+
+def test_resolution_cache():
+    response = client.post(
+        "/larkm",
+        json={
+            "naan": "99999",
+            "shoulder": "s2",
+            "identifier": "0c4bb5d6e4a1",
+            "target": "https://example.com/cached",
+        },
+    )
+    assert response.status_code == 201
+
+    stats_before = client.get("/larkm/stats/99999").json()["resolution_cache"]
+    for i in range(2):
+        response = client.get("/ark:99999/s20c4bb5d6e4a1", follow_redirects=False)
+        assert response.headers["location"] == "https://example.com/cached"
+    stats_after = client.get("/larkm/stats/99999").json()["resolution_cache"]
+    assert stats_after["hits"] > stats_before["hits"]
+
+    # Updating the ARK invalidates its cached record.
+    response = client.patch(
+        "/larkm/ark:99999/s20c4bb5d6e4a1",
+        json={
+            "target": "https://example.com/cached-updated",
+            "ark_string": "ark:99999/s20c4bb5d6e4a1",
+        },
+    )
+    assert response.status_code == 200
+    response = client.get("/ark:99999/s20c4bb5d6e4a1", follow_redirects=False)
+    assert response.headers["location"] == "https://example.com/cached-updated"
+
+    # So does deleting it.
+    response = client.delete("/larkm/ark:99999/s20c4bb5d6e4a1")
+    assert response.status_code == 204
+    response = client.get("/ark:99999/s20c4bb5d6e4a1", follow_redirects=False)
+    assert response.status_code == 404
+
+    # Cache entries are evicted in least-recently-used order, and expire.
+    cache = ResolutionCache(max_size=2, ttl=300)
+    cache.set("a", {"target": "a"}, cache.version)
+    cache.set("b", {"target": "b"}, cache.version)
+    cache.get("a")
+    cache.set("c", {"target": "c"}, cache.version)
+    assert cache.get("b") is None
+    assert cache.get("a") == {"target": "a"}
+    assert cache.stats()["evictions"] == 1
+
+    # A record read before an invalidation is not cached.
+    version = cache.version
+    cache.invalidate("a")
+    cache.set("a", {"target": "stale"}, version)
+    assert cache.get("a") is None
+
+    cache = ResolutionCache(max_size=2, ttl=-1)
+    cache.set("a", {"target": "a"}, cache.version)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_request_log_writer(tmp_path):
+    response = client.get("/ark:12345/x9062cdde7f9d6", follow_redirects=False)
+    assert response.status_code == 307
+    log_writer.flush()
+    with open("/tmp/larkm.log") as log_file:
+        last_entry = log_file.readlines()[-1].rstrip("\n").split("\t")
+    assert last_entry[4:] == [
+        "ark:12345/x9062cdde7f9d6",
+        "Resolution to https://example.com/foo",
+    ]
+
+    # Entries are written to the log file they were queued for.
+    writer = RequestLogWriter(batch_size=2, flush_interval=0.01)
+    for i in range(5):
+        writer.write(str(tmp_path / "a.log"), f"a{i}")
+        writer.write(str(tmp_path / "b.log"), f"b{i}")
+    writer.flush()
+    assert (tmp_path / "a.log").read_text() == "a0\na1\na2\na3\na4\n"
+    assert (tmp_path / "b.log").read_text() == "b0\nb1\nb2\nb3\nb4\n"
+    assert writer.stats()["written"] == 10
+    writer.close()
+
+    # A full queue drops entries rather than blocking.
+    writer = RequestLogWriter(max_queue_size=1, overflow="drop")
+    # Pretend the writer thread is running so nothing drains the queue.
+    writer._thread = True
+    writer.write(str(tmp_path / "c.log"), "c0")
+    writer.write(str(tmp_path / "c.log"), "c1")
+    assert writer.stats()["dropped"] == 1
+
+
+def test_upgrade_database(tmp_path):
+    db_path = str(tmp_path / "larkm.db")
+    shutil.copyfile("fixtures/larkmtest.db.bak", db_path)
+    assert upgrade_database(db_path) == [1]
+    # Running it again does nothing.
+    assert upgrade_database(db_path) == []
+
+    con = sqlite3.connect(db_path)
+    assert con.execute("select max(version) from schema_version").fetchone()[0] == 1
+    # The fixture contains an exact duplicate of ark:12345/x9062cdde7f9d6.
+    assert con.execute("select count(*) from arks").fetchone()[0] == 21
+    indexes = [
+        row[0]
+        for row in con.execute("select name from sqlite_master where type = 'index'")
+    ]
+    assert "identifier_unique_idx" in indexes
+    assert "target_unique_idx" in indexes
+    con.close()
+
+    # Rows that conflict without being exact duplicates stop the upgrade.
+    db_path = str(tmp_path / "conflicts.db")
+    shutil.copyfile("fixtures/larkmtest.db.bak", db_path)
+    con = sqlite3.connect(db_path)
+    con.execute(
+        "update arks set target = 'http://example.com/2' where target = 'http://example.com/1'"
+    )
+    con.commit()
+    con.close()
+    try:
+        upgrade_database(db_path)
+        assert False
+    except sqlite3.IntegrityError:
+        pass
+    con = sqlite3.connect(db_path)
+    assert con.execute("select max(version) from schema_version").fetchone()[0] is None
+    assert con.execute("select count(*) from arks").fetchone()[0] == 22
+    con.close()
+
+
+def test_unique_indexes():
+    # ARKs in NAAN 33333 are stored in a database with unique indexes.
+    response = client.post(
+        "/larkm",
+        json={
+            "naan": "33333",
+            "identifier": "b4e0f81c6a2d",
+            "target": "https://example.com/unique",
+        },
+    )
+    assert response.status_code == 201
+
+    response = client.post(
+        "/larkm",
+        json={
+            "naan": "33333",
+            "identifier": "b4e0f81c6a2d",
+            "target": "https://example.com/unique2",
+        },
+    )
+    assert response.status_code == 409
+    assert response.json() == {"detail": "Identifier b4e0f81c6a2d already in use."}
+
+    response = client.post(
+        "/larkm",
+        json={"naan": "33333", "target": "https://example.com/unique"},
+    )
+    assert response.status_code == 409
+    assert response.json() == {
+        "detail": "'target' value https://example.com/unique already in use."
+    }
+
+    # Empty targets can be shared.
+    for i in range(2):
+        response = client.post("/larkm", json={"naan": "33333"})
+        assert response.status_code == 201
+
+    response = client.post(
+        "/larkm",
+        json={"naan": "33333", "target": "https://example.com/unique3"},
+    )
+    assert response.status_code == 201
+    ark_string = response.json()["ark"]["ark_string"]
+    response = client.patch(
+        f"/larkm/{ark_string}",
+        json={"ark_string": ark_string, "target": "https://example.com/unique"},
+    )
+    assert response.status_code == 409
+
+    response = client.get("/larkm/stats/33333")
+    assert response.json()["sqlite_pool"]["schema_version"] == 1
+
+
 def test_bad_api_key():
     create_response = client.post(
         "/larkm",